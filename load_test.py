@@ -0,0 +1,532 @@
+# load_test.py
+#
+# Headless concurrent-session load test for main_app.py.
+#
+#   python load_test.py --sessions 8 --iterations 3
+#
+# Every simulated user is its own AppTest (own session state) driven from its
+# own thread, so they share the same process-level state a real
+# `streamlit run` server does: imported modules, the labor_planning sqlite
+# connection/cursor, CPU and memory. The app runs from a scratch copy of the
+# repo so bulk uploads never touch the real labor_model.db, and the GitHub
+# GeoJSON endpoint is served from a local HTTP stand-in.
+#
+# Reports p50/p95/p99 latency and throughput of clean reruns per flow,
+# failed reruns, peak RSS and sqlite lock/cursor errors, and exits non-zero
+# when any rerun errored or a flow was aborted. Bulk uploads need openpyxl.
+#
+# On the checked-in tree the Site Selection page (the default after login)
+# never renders: plotly 6+ has no px.set_mapbox_access_token, and
+# FL_Wealth_Ranking_Data.csv has no `Divorce Rate` or `Household200Kcount`
+# columns. slider_sweep, zip_compare and the GeoJSON stand-in have only been
+# exercised against a copy of the app patched past those two problems.
+
+import argparse
+import faulthandler
+import io
+import json
+import logging
+import math
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import pandas as pd
+import requests
+from streamlit.proto.Slider_pb2 import Slider as SliderProto
+from streamlit.runtime import Runtime
+from streamlit.testing.v1 import AppTest, app_test
+
+BASE_DIR = Path(__file__).parent
+
+APP_FILES = [
+    "main_app.py",
+    "site_selection_model.py",
+    "labor_planning.py",
+    "labor_potential.py",
+    "hiring_optimization.py",
+    "network_optimization.py",
+    "FL_Wealth_Ranking_Data.csv",
+    "labor_model.db",
+    "workforce_ai_logo.png",
+]
+
+# must match GITHUB_BASE in site_selection_model.render()
+GEOJSON_REMOTE_BASE = "https://raw.githubusercontent.com/Sheelgupte/Miami/main/geojson"
+GEOJSON_FILE        = "fl_florida_zip_codes_geo.min.json"
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# exception text that means two sessions fought over the shared sqlite handle
+DB_LOCK_MARKERS = (
+    "database is locked",
+    "database table is locked",
+    "recursive use of cursors",
+    "cannot operate on a closed",
+)
+
+
+# ─── 1. Sandbox & GeoJSON stand-in ──────────────────────────────────────────────
+def make_sandbox():
+    sandbox = Path(tempfile.mkdtemp(prefix="workforce_load_"))
+    for name in APP_FILES:
+        src = BASE_DIR / name
+        if src.exists():
+            shutil.copy2(src, sandbox / name)
+    return sandbox
+
+def synth_geojson(csv_path):
+    # one small square per ZIP on a grid over Florida, keyed the way the
+    # choropleth's featureidkey expects
+    zips = pd.read_csv(csv_path, encoding="utf-8-sig", usecols=[0]).iloc[:, 0].astype(str)
+    features = []
+    for i, z in enumerate(zips):
+        lon = -87.5 + (i % 40) * 0.15
+        lat = 25.0 + (i // 40) * 0.2
+        ring = [[lon, lat], [lon+0.1, lat], [lon+0.1, lat+0.1], [lon, lat+0.1], [lon, lat]]
+        features.append({
+            "type": "Feature",
+            "properties": {"ZCTA5CE10": z},
+            "geometry": {"type": "Polygon", "coordinates": [ring]},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+def start_geojson_server(sandbox, geojson_path=None):
+    geo_dir = sandbox / "geojson"
+    geo_dir.mkdir(exist_ok=True)
+    target = geo_dir / GEOJSON_FILE
+    if geojson_path:
+        shutil.copy2(geojson_path, target)
+    else:
+        target.write_text(json.dumps(synth_geojson(sandbox / "FL_Wealth_Ranking_Data.csv")))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=str(geo_dir)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def redirect_geojson(local_base):
+    # site_selection_model calls requests.get() on every rerun; point the
+    # GitHub URL at the local server but keep the real HTTP round trip
+    real_get = requests.get
+
+    def get(url, *args, **kwargs):
+        if isinstance(url, str) and url.startswith(GEOJSON_REMOTE_BASE):
+            url = local_base + url[len(GEOJSON_REMOTE_BASE):]
+        return real_get(url, *args, **kwargs)
+
+    requests.get = get
+    return real_get
+
+class _PinnedMeta(type):
+    def __setattr__(cls, name, value):
+        if name != "_instance":
+            return super().__setattr__(name, value)
+        if value is not None and Runtime._instance is None:
+            Runtime._instance = value
+
+class _PinnedRuntime(Runtime, metaclass=_PinnedMeta):
+    pass
+
+def pin_runtime():
+    # AppTest installs a fresh mock Runtime singleton for every run and clears
+    # it afterwards, which pulls it out from under sessions running in
+    # parallel. Keep the first one for the whole test instead, like the single
+    # Runtime a real server shares between sessions.
+    app_test.Runtime = _PinnedRuntime
+
+def unpin_runtime():
+    app_test.Runtime = Runtime
+    Runtime._instance = None
+
+
+# ─── 2. Upload payloads ─────────────────────────────────────────────────────────
+def _xlsx(df, header=True):
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False, header=header)
+    return buf.getvalue()
+
+def build_payloads(weeks=52):
+    forecast = pd.DataFrame({
+        "WeekStart": pd.date_range("2025-01-06", periods=weeks, freq="W-MON"),
+        "Value":     [1000 + 10*i for i in range(weeks)],
+    })
+    roles = pd.DataFrame({
+        "labor_model_id": [1, 1, 1],
+        "name":           ["Server", "Cook", "Host"],
+    })
+    tasks = pd.DataFrame({
+        "labor_model_id": [1, 1],
+        "Taskname":       ["Seat guests", "Prep line"],
+        "Type":           ["Variable", "Fixed"],
+        "Linked Driver":  ["Covers", "Covers"],
+        "TPU":            [0.05, 2.0],
+        "Frequency":      [1, 7],
+        "Role":           ["Host", "Cook"],
+    })
+    return {
+        # labor_planning reads the forecast sheet with header=None
+        "lp_fc":    ("forecast.xlsx", _xlsx(forecast, header=False), XLSX_MIME),
+        "lp_roles": ("roles.xlsx",    _xlsx(roles),                  XLSX_MIME),
+        "lp_tasks": ("tasks.xlsx",    _xlsx(tasks),                  XLSX_MIME),
+    }
+
+
+# ─── 3. Results ─────────────────────────────────────────────────────────────────
+class FlowAborted(Exception):
+    pass
+
+class Recorder:
+    def __init__(self):
+        self.lock      = threading.Lock()
+        self.latencies = defaultdict(list)   # flow -> [seconds per clean rerun]
+        self.failed    = Counter()           # flow -> reruns that raised
+        self.db_locks  = Counter()           # message -> count
+        self.errors    = Counter()           # message -> count
+        self.aborted   = Counter()           # flow -> count
+        self.notes     = set()               # known app bugs worked around
+
+    def rerun(self, flow, target, timeout):
+        # target is the AppTest itself or a widget that was just changed;
+        # both run the whole script and hand back the AppTest
+        start = time.perf_counter()
+        try:
+            at = target.run(timeout=timeout)
+        except Exception as e:  # timeouts and runner failures
+            self.error(e)
+            with self.lock:
+                self.failed[flow] += 1
+            raise FlowAborted(flow)
+        elapsed = time.perf_counter() - start
+        # failed reruns return early from the script, so keep them out of
+        # the latency figures and just count them
+        for exc in at.exception:
+            # the element's own .type is always "exception"; the class name
+            # of what the script raised lives on the proto
+            self._error(f"{exc.proto.type}: {exc.message}")
+        with self.lock:
+            if at.exception:
+                self.failed[flow] += 1
+            else:
+                self.latencies[flow].append(elapsed)
+        return at
+
+    def error(self, e):
+        self._error(f"{type(e).__name__}: {e}")
+
+    def _error(self, message):
+        message = str(message).strip().splitlines()[0] if str(message).strip() else "<empty>"
+        with self.lock:
+            if any(m in message.lower() for m in DB_LOCK_MARKERS):
+                self.db_locks[message] += 1
+            else:
+                self.errors[message] += 1
+
+    def note(self, text):
+        with self.lock:
+            self.notes.add(text)
+
+    def abort(self, flow):
+        with self.lock:
+            self.aborted[flow] += 1
+
+
+# ─── 4. Scripted flows ──────────────────────────────────────────────────────────
+def _button(at, label):
+    for b in at.button:
+        if b.label == label:
+            return b
+    raise FlowAborted(f"button {label!r} not rendered")
+
+def _choose_model(rec, flow, at, model, timeout):
+    radio = at.sidebar.radio
+    if not radio:
+        raise FlowAborted("model selector not rendered")
+    if radio[0].value != model:
+        rec.rerun(flow, radio[0].set_value(model), timeout)
+
+def _lp_summary(rec, flow, at, timeout):
+    # a flow that aborted mid-way can leave the session on a Labor Planning
+    # subpage; go back to the summary the way a user would
+    _choose_model(rec, flow, at, "Labor Planning", timeout)
+    labels = {b.label for b in at.button}
+    if "➕ Upload Model Components" in labels:
+        return
+    if "← Back to Summary" not in labels:
+        # last rerun crashed before the back button rendered; redraw first
+        rec.rerun(flow, at, timeout)
+    rec.rerun(flow, _button(at, "← Back to Summary").click(), timeout)
+
+def flow_login(rec, sandbox, timeout):
+    at = AppTest.from_file(str(sandbox / "main_app.py"), default_timeout=timeout)
+    rec.rerun("login", at, timeout)
+    rec.rerun("login", _button(at, "Login").click(), timeout)
+    if not at.session_state["authenticated"]:
+        raise FlowAborted("login did not authenticate")
+    # app bug: labor_planning sets lp_page at module level, so only the
+    # session that first imports it gets the key and every other one fails
+    # on its first Labor Planning rerun. Seed it so all sessions reach the
+    # shared sqlite cursor, and keep the bug in the report.
+    if "lp_page" not in at.session_state:
+        at.session_state["lp_page"] = "landing"
+        rec.note("lp_page seeded by the harness: labor_planning only initialises "
+                 "it for the session that first imports the module")
+    return at
+
+def _zip_boxes(at):
+    try:
+        return [at.selectbox(key=f"zip{i}") for i in range(3)]
+    except KeyError:
+        raise FlowAborted("ZIP selectors not rendered")
+
+def _snap(s, x):
+    # AppTest reports every slider bound as a float; send only values the
+    # UI itself could produce, i.e. on the step grid and of the slider's type
+    lo, hi, step = s.min, s.max, s.step
+    x = min(hi, max(lo, lo + round((x - lo) / step) * step))
+    # the round() drops float noise such as 6.3999999 off a 0.1 grid
+    return int(round(x)) if s.proto.data_type == SliderProto.INT else round(x, 9)
+
+def flow_slider_sweep(rec, at, timeout, rng, **_):
+    _choose_model(rec, "slider_sweep", at, "Site Selection Model", timeout)
+    if not at.slider:
+        raise FlowAborted("site selection sliders not rendered")
+    # start from the app's own picks (the first three ZIPs) rather than
+    # whatever an earlier zip_compare left behind
+    boxes = _zip_boxes(at)
+    for box, zc in zip(boxes, boxes[0].options[:3]):
+        box.set_value(zc)
+    failed_before = rec.failed["slider_sweep"]
+    # one slider at a time, put back to its full range before the next one,
+    # so the trims never stack up and filter every ZIP away
+    for i in range(len(at.slider)):
+        s = at.slider[i]
+        lo, hi = s.min, s.max
+        span = hi - lo
+        a = _snap(s, lo + span * rng.uniform(0.0, 0.2))
+        b = _snap(s, hi - span * rng.uniform(0.0, 0.2))
+        rec.rerun("slider_sweep", s.set_range(a, max(a, b)), timeout)
+        at.slider[i].set_range(_snap(s, lo), _snap(s, hi))
+    rec.rerun("slider_sweep", at, timeout)
+    if rec.failed["slider_sweep"] > failed_before:
+        rec.note("slider_sweep failures: when a filter drops a selected ZIP, the "
+                 "app's index-based defaults can put two ZIP boxes on the same "
+                 "ZIP and the AI insights block crashes")
+
+def flow_zip_compare(rec, at, timeout, rng, **_):
+    _choose_model(rec, "zip_compare", at, "Site Selection Model", timeout)
+    boxes = _zip_boxes(at)
+    options = boxes[0].options
+    if len(options) < 3:
+        raise FlowAborted("fewer than 3 ZIPs left to compare")
+    # three different ZIPs in one rerun; the insights panel can't handle the
+    # same one twice, which a box-by-box change can pass through
+    for box, zc in zip(boxes, rng.sample(options, 3)):
+        box.set_value(zc)
+    rec.rerun("zip_compare", at, timeout)
+
+def flow_bulk_upload(rec, at, timeout, payloads, **_):
+    _lp_summary(rec, "bulk_upload", at, timeout)
+    rec.rerun("bulk_upload", _button(at, "➕ Upload Model Components").click(), timeout)
+    for key, label in [("lp_fc",    "▶️ Process Forecast Upload"),
+                       ("lp_roles", "▶️ Process Roles Upload"),
+                       ("lp_tasks", "▶️ Process Tasks Upload")]:
+        try:
+            uploader = at.file_uploader(key=key)
+        except KeyError:
+            raise FlowAborted("upload page not rendered")
+        rec.rerun("bulk_upload", uploader.set_value(payloads[key]), timeout)
+        # each Process button sends the page back to the summary
+        rec.rerun("bulk_upload", _button(at, label).click(), timeout)
+        if key != "lp_tasks":
+            rec.rerun("bulk_upload", _button(at, "➕ Upload Model Components").click(), timeout)
+            try:
+                at.file_uploader(key=key).set_value(None)
+            except KeyError:
+                raise FlowAborted("upload page not rendered")
+
+def flow_forecast(rec, at, timeout, **_):
+    _lp_summary(rec, "forecast", at, timeout)
+    rec.rerun("forecast", _button(at, "📈 View Forecast History").click(), timeout)
+    rec.rerun("forecast", _button(at, "← Back to Summary").click(), timeout)
+
+FLOWS = {
+    "slider_sweep": flow_slider_sweep,
+    "zip_compare":  flow_zip_compare,
+    "bulk_upload":  flow_bulk_upload,
+    "forecast":     flow_forecast,
+}
+
+
+# ─── 5. Session driver ──────────────────────────────────────────────────────────
+def run_session(idx, rec, args, sandbox, payloads, barrier):
+    rng = random.Random(args.seed + idx)
+    barrier.wait()
+    try:
+        at = flow_login(rec, sandbox, args.timeout)
+    except FlowAborted:
+        rec.abort("login")
+        return
+    except Exception as e:
+        rec.error(e)
+        rec.abort("login")
+        return
+    for _ in range(args.iterations):
+        for name in args.flows:
+            try:
+                FLOWS[name](rec, at=at, timeout=args.timeout, rng=rng, payloads=payloads)
+            except FlowAborted:
+                rec.abort(name)
+            except Exception as e:  # harness bug or odd app state; keep the user going
+                rec.error(e)
+                rec.abort(name)
+
+def _pct(values, q):
+    ordered = sorted(values)
+    # nearest-rank
+    k = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[k]
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def summarize(rec, args, wall):
+    # latency and throughput only cover reruns that finished cleanly;
+    # failed ones are counted separately
+    def stats(values, failed):
+        return {
+            "reruns": len(values),
+            "failed": failed,
+            "p50_ms": round(_pct(values, 50) * 1000, 1) if values else None,
+            "p95_ms": round(_pct(values, 95) * 1000, 1) if values else None,
+            "p99_ms": round(_pct(values, 99) * 1000, 1) if values else None,
+        }
+
+    everything = [v for vals in rec.latencies.values() for v in vals]
+    flows = list(dict.fromkeys([*rec.latencies, *rec.failed]))
+    peak = _peak_rss_mb()
+    return {
+        "sessions":         args.sessions,
+        "iterations":       args.iterations,
+        "flows":            args.flows,
+        "wall_s":           round(wall, 2),
+        "throughput_rps":   round(len(everything) / wall, 2) if wall > 0 else 0.0,
+        "overall":          stats(everything, sum(rec.failed.values())),
+        "per_flow":         {f: stats(rec.latencies[f], rec.failed[f]) for f in flows},
+        "peak_rss_mb":      round(peak, 1) if peak is not None else None,
+        "db_lock_errors":   sum(rec.db_locks.values()),
+        "db_lock_messages": dict(rec.db_locks),
+        "script_errors":    sum(rec.errors.values()),
+        "error_messages":   dict(rec.errors.most_common(10)),
+        "aborted_flows":    dict(rec.aborted),
+        "notes":            sorted(rec.notes),
+    }
+
+def print_report(r):
+    print(f"\nSessions: {r['sessions']}  iterations: {r['iterations']}  flows: {', '.join(r['flows'])}")
+    print(f"Wall time: {r['wall_s']}s  throughput: {r['throughput_rps']} reruns/s  "
+          f"peak RSS: {r['peak_rss_mb']} MB")
+    print(f"\n{'flow':<14}{'reruns':>8}{'failed':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(r["per_flow"].items()) + [("ALL", r["overall"])]
+    for name, s in rows:
+        pcts = "".join(f"{'-' if s[k] is None else s[k]:>10}" for k in ("p50_ms", "p95_ms", "p99_ms"))
+        print(f"{name:<14}{s['reruns']:>8}{s['failed']:>8}{pcts}")
+    print(f"\nDB lock errors: {r['db_lock_errors']}")
+    for msg, n in r["db_lock_messages"].items():
+        print(f"  {n:>5} × {msg}")
+    print(f"Script errors:  {r['script_errors']}")
+    for msg, n in r["error_messages"].items():
+        print(f"  {n:>5} × {msg}")
+    if r["aborted_flows"]:
+        print("Aborted flows:  " + ", ".join(f"{f}={n}" for f, n in r["aborted_flows"].items()))
+    for note in r["notes"]:
+        print(f"Note: {note}")
+
+
+# ─── 6. Entry ───────────────────────────────────────────────────────────────────
+def _positive(kind):
+    def parse(text):
+        value = kind(text)
+        if value <= 0:
+            raise argparse.ArgumentTypeError(f"must be positive, got {text}")
+        return value
+    return parse
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Concurrent-session load test for main_app.py")
+    p.add_argument("--sessions",   type=_positive(int),   default=4,   help="simulated concurrent users")
+    p.add_argument("--iterations", type=_positive(int),   default=2,   help="passes over the flows per session")
+    p.add_argument("--flows",      nargs="+",              default=list(FLOWS), choices=list(FLOWS))
+    p.add_argument("--timeout",    type=_positive(float), default=30, help="seconds allowed per rerun")
+    p.add_argument("--seed",       type=int,               default=0)
+    p.add_argument("--geojson",    type=Path,              help="local GeoJSON file to serve instead of a synthetic one")
+    p.add_argument("--json",       type=Path,              help="also write the report to this file")
+    args = p.parse_args(argv)
+
+    # both are process-wide; put back whatever the caller had in the finally
+    prev_log_disable = logging.root.manager.disable
+    prev_faulthandler = faulthandler.is_enabled()
+    # script exceptions are collected from each rerun; keep the console readable
+    logging.disable(logging.CRITICAL)
+    # sessions hammering labor_planning's shared sqlite cursor can take the
+    # whole process down; at least leave the colliding stacks behind
+    faulthandler.enable()
+
+    sandbox = make_sandbox()
+    server, local_base = start_geojson_server(sandbox, args.geojson)
+    real_get = redirect_geojson(local_base)
+    pin_runtime()
+    sys.path.insert(0, str(sandbox))
+    try:
+        rec      = Recorder()
+        payloads = build_payloads()
+        barrier  = threading.Barrier(args.sessions)
+        threads  = [
+            threading.Thread(target=run_session, args=(i, rec, args, sandbox, payloads, barrier))
+            for i in range(args.sessions)
+        ]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        report = summarize(rec, args, time.perf_counter() - start)
+    finally:
+        logging.disable(prev_log_disable)
+        if not prev_faulthandler:
+            faulthandler.disable()
+        sys.path.remove(str(sandbox))
+        requests.get = real_get
+        unpin_runtime()
+        server.shutdown()
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    return report
+
+if __name__ == "__main__":
+    report = main()
+    # non-zero so a pre-deployment check can gate on it
+    if report["db_lock_errors"] or report["aborted_flows"] or report["script_errors"]:
+        sys.exit(1)